@@ -0,0 +1,4 @@
+from .forwarding import Destination, ForwardingPipeline, load_destinations_from_env
+from .retry_queue import RetryQueue
+
+__all__ = ["Destination", "ForwardingPipeline", "RetryQueue", "load_destinations_from_env"]
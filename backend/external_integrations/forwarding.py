@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from .retry_queue import RetryQueue
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Destination:
+    """An external system that receives batches of accepted updates"""
+    name: str
+    url: str
+    events: Tuple[str, ...] = ("position", "flight")
+    headers: Dict[str, str] = field(default_factory=dict)
+    batch_size: int = 50
+    flush_interval: float = 1.0
+    queue_size: int = 10000
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def load_destinations_from_env() -> List[Destination]:
+    """Build destinations from BOOKING_SYSTEM_URL and PARTNER_TRACKING_URL, when set"""
+    destinations = []
+    booking_url = os.environ.get("BOOKING_SYSTEM_URL")
+    if booking_url:
+        destinations.append(Destination(
+            name="booking",
+            url=booking_url,
+            headers={"X-API-Key": os.environ.get("BOOKING_SYSTEM_API_KEY", "")},
+        ))
+    tracking_url = os.environ.get("PARTNER_TRACKING_URL")
+    if tracking_url:
+        destinations.append(Destination(
+            name="partner_tracking",
+            url=tracking_url,
+            headers={"X-API-Key": os.environ.get("PARTNER_TRACKING_API_KEY", "")},
+        ))
+    return destinations
+
+
+# Wakes a batch worker blocked on an empty queue when the pipeline stops
+_STOP = object()
+
+# How often a batch worker checks for more events while filling a batch
+_FILL_POLL_INTERVAL = 0.05
+
+
+class ForwardingPipeline:
+    """Forwards accepted webhook updates to external destinations in the background.
+
+    `publish` never blocks the caller: events go into a bounded in-memory queue
+    per destination, a worker drains it in batches over a pooled keep-alive HTTP
+    client, and failed batches go to a disk-backed retry queue that is replayed
+    with exponential backoff. Events that don't fit in the queue are handed to
+    the worker, which writes them to the retry queue off the event loop.
+    """
+
+    def __init__(self, destinations: List[Destination], queue_dir: Path,
+                 timeout: float = 10.0, retry_poll_interval: float = 1.0):
+        self.destinations = destinations
+        self.timeout = timeout
+        self.retry_poll_interval = retry_poll_interval
+        self.retry_queues = {d.name: RetryQueue(Path(queue_dir) / d.name) for d in destinations}
+        self.dropped = {d.name: 0 for d in destinations}
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._overflow: Dict[str, List[dict]] = {d.name: [] for d in destinations}
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if not self.destinations or self._client is not None:
+            return
+        self._stopping.clear()
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=4 * len(self.destinations),
+                                max_keepalive_connections=2 * len(self.destinations)),
+        )
+        for destination in self.destinations:
+            # Unbounded so the stop sentinel always fits; publish enforces queue_size
+            queue = asyncio.Queue()
+            self._queues[destination.name] = queue
+            self._tasks.append(asyncio.create_task(self._batch_worker(destination, queue)))
+            self._tasks.append(asyncio.create_task(self._retry_worker(destination)))
+        logger.info("Forwarding updates to: %s", ", ".join(d.name for d in self.destinations))
+
+    async def stop(self):
+        """Stop the workers, write everything not yet delivered to disk and close the HTTP client"""
+        if self._client is None:
+            return
+        self._stopping.set()
+        for queue in self._queues.values():
+            queue.put_nowait(_STOP)
+        # Workers finish at most one in-flight request, bounded by the client timeout
+        _, pending = await asyncio.wait(self._tasks, timeout=self.timeout + 1.0)
+        if pending:
+            logger.warning("Forwarding workers did not stop in time, cancelling them")
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending, timeout=1.0)
+        self._tasks = []
+
+        for destination in self.destinations:
+            queue = self._queues.pop(destination.name, None)
+            pending_events = self._overflow[destination.name]
+            self._overflow[destination.name] = []
+            while queue is not None and not queue.empty():
+                event = queue.get_nowait()
+                if event is not _STOP:
+                    pending_events.append(event)
+            if pending_events:
+                await self._spill(destination, pending_events)
+        await self._client.aclose()
+        self._client = None
+
+    def publish(self, event_type: str, data: dict):
+        """Queue an accepted update for every destination subscribed to `event_type`"""
+        if not self._queues:
+            return
+        event = None
+        for destination in self.destinations:
+            if event_type not in destination.events:
+                continue
+            queue = self._queues.get(destination.name)
+            if queue is None:
+                continue
+            if event is None:
+                # Serialize once, only when someone receives it
+                event = json.loads(json.dumps({"type": event_type, "data": data}, default=_json_default))
+            if queue.qsize() < destination.queue_size:
+                queue.put_nowait(event)
+                continue
+            overflow = self._overflow[destination.name]
+            if len(overflow) < destination.queue_size:
+                overflow.append(event)
+            else:
+                if self.dropped[destination.name] == 0:
+                    logger.error("Forwarding backlog for %s is full, dropping updates", destination.name)
+                self.dropped[destination.name] += 1
+
+    async def _spill(self, destination: Destination, events: List[dict]):
+        """Write events to the retry queue in batch-sized files, off the event loop"""
+        retry_queue = self.retry_queues[destination.name]
+        size = destination.batch_size
+
+        def write():
+            for start in range(0, len(events), size):
+                retry_queue.push(events[start:start + size], attempts=0)
+
+        await asyncio.to_thread(write)
+
+    async def _send(self, destination: Destination, events: List[dict]) -> bool:
+        try:
+            response = await self._client.post(destination.url, json={"events": events},
+                                               headers=destination.headers)
+        except httpx.HTTPError as e:
+            logger.warning("Forwarding to %s failed: %s", destination.name, e)
+            return False
+        if response.status_code >= 400:
+            logger.warning("Forwarding to %s failed with status %d",
+                           destination.name, response.status_code)
+            return False
+        return True
+
+    async def _fill_batch(self, destination: Destination, queue: asyncio.Queue, batch: List[dict]):
+        """Add events to `batch` until it is full, flush_interval passes or the pipeline stops"""
+        event = await queue.get()
+        if event is _STOP:
+            return
+        batch.append(event)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + destination.flush_interval
+        while len(batch) < destination.batch_size and not self._stopping.is_set():
+            while len(batch) < destination.batch_size and not queue.empty():
+                event = queue.get_nowait()
+                if event is _STOP:
+                    return
+                batch.append(event)
+            remaining = deadline - loop.time()
+            if remaining <= 0 or len(batch) >= destination.batch_size:
+                break
+            await asyncio.sleep(min(remaining, _FILL_POLL_INTERVAL))
+
+    async def _batch_worker(self, destination: Destination, queue: asyncio.Queue):
+        overflow = self._overflow[destination.name]
+        # Events taken from the queue but not yet delivered or written to disk;
+        # whatever is left here when the worker exits is written by stop()
+        batch: List[dict] = []
+        try:
+            while not self._stopping.is_set():
+                if overflow:
+                    events = overflow[:]
+                    overflow.clear()
+                    await self._spill(destination, events)
+                await self._fill_batch(destination, queue, batch)
+                if self._stopping.is_set() or not batch:
+                    continue
+                events = batch[:]
+                batch.clear()
+                try:
+                    delivered = await self._send(destination, events)
+                except asyncio.CancelledError:
+                    batch.extend(events)
+                    raise
+                if not delivered:
+                    await self._spill(destination, events)
+        finally:
+            overflow.extend(batch)
+
+    async def _retry_worker(self, destination: Destination):
+        retry_queue = self.retry_queues[destination.name]
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.retry_poll_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            for path in await asyncio.to_thread(retry_queue.due):
+                if self._stopping.is_set():
+                    return
+                stored = await asyncio.to_thread(retry_queue.read, path)
+                if stored is None:
+                    continue
+                attempts, events = stored
+                delivered = await self._send(destination, events)
+                if not delivered:
+                    await asyncio.to_thread(retry_queue.push, events, attempts + 1)
+                await asyncio.to_thread(retry_queue.remove, path)
+                if not delivered:
+                    # Destination still down, wait for the next poll before trying the rest
+                    break
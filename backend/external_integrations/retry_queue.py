@@ -0,0 +1,78 @@
+import heapq
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RetryQueue:
+    """Disk-backed queue of batches that failed to reach a destination.
+
+    Each batch is a JSON file named after the time it is due for its next
+    attempt, so due batches can be found by listing the directory without
+    reading every file.
+    """
+
+    def __init__(self, directory: Path, base_delay: float = 2.0, max_delay: float = 300.0,
+                 max_attempts: int = 20):
+        self.directory = Path(directory)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def backoff(self, attempts: int) -> float:
+        """Exponential backoff with jitter for a batch that already failed `attempts` times"""
+        delay = min(self.base_delay * (2 ** (attempts - 1)), self.max_delay)
+        return delay * random.uniform(0.5, 1.0)
+
+    def push(self, events: List[dict], attempts: int = 1) -> Optional[Path]:
+        """Store a failed batch; drops it once it has exhausted `max_attempts`"""
+        if attempts >= self.max_attempts:
+            logger.error("Dropping batch of %d events for %s after %d attempts",
+                         len(events), self.directory.name, attempts)
+            return None
+        due = time.time() + self.backoff(attempts)
+        path = self.directory / f"{int(due * 1000):015d}-{uuid.uuid4().hex}.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"attempts": attempts, "events": events}, f)
+        os.replace(tmp_path, path)
+        return path
+
+    def due(self, now: Optional[float] = None, limit: int = 10) -> List[Path]:
+        """Paths of batches whose next attempt is due, oldest first"""
+        now_ms = int((now if now is not None else time.time()) * 1000)
+        with os.scandir(self.directory) as entries:
+            names = heapq.nsmallest(limit, (e.name for e in entries if e.name.endswith(".json")))
+        return [self.directory / name for name in names if int(name.split("-", 1)[0]) <= now_ms]
+
+    def read(self, path: Path) -> Optional[Tuple[int, List[dict]]]:
+        """Read a stored batch, returning (attempts, events)"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except ValueError:
+            logger.exception("Corrupt retry batch %s, moving it aside", path)
+            path.rename(path.with_suffix(".corrupt"))
+            return None
+        except OSError:
+            logger.exception("Could not read retry batch %s", path)
+            return None
+        return data["attempts"], data["events"]
+
+    def remove(self, path: Path):
+        """Remove a batch once it has been delivered or rescheduled"""
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.directory.glob("*.json"))
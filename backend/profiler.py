@@ -0,0 +1,120 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from starlette.routing import Route
+
+# Code object of the coroutine that dispatches a request to its route;
+# its `self` local is the matched Route, which gives the route template.
+_ROUTE_HANDLE_CODE = Route.handle.__code__
+
+# Leaf frames of threads that are just waiting for work
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+def _frame_name(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for the running process.
+
+    A background thread periodically snapshots the Python stacks of all other
+    threads with `sys._current_frames()`; nothing is instrumented, so the
+    overhead is limited to the sampling thread itself.
+    """
+
+    def __init__(self, interval: float = 0.005, by_route: bool = False, include_idle: bool = False):
+        self.interval = interval
+        self.by_route = by_route
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.duration = 0.0
+        self.rounds = 0
+        self._frames: Dict[object, str] = {}
+
+    def run(self, seconds: float):
+        """Sample for `seconds`, blocking the calling thread (run it off the event loop)"""
+        own_thread = threading.get_ident()
+        start = time.monotonic()
+        deadline = start + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = self._sample(frame)
+                if stack:
+                    self.stacks[stack] += 1
+            self.rounds += 1
+            time.sleep(self.interval)
+        self.duration = time.monotonic() - start
+
+    def _sample(self, frame) -> Optional[Tuple[str, ...]]:
+        leaf = frame.f_code
+        if not self.include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in _IDLE_LEAVES:
+            return None
+        names = []
+        route = None
+        while frame is not None:
+            code = frame.f_code
+            name = self._frames.get(code)
+            if name is None:
+                name = self._frames[code] = _frame_name(code)
+            names.append(name)
+            if self.by_route and route is None and code is _ROUTE_HANDLE_CODE:
+                route_obj = frame.f_locals.get("self")
+                route = getattr(route_obj, "path", None)
+            frame = frame.f_back
+        names.reverse()
+        if self.by_route:
+            names.insert(0, f"[route] {route or 'none'}")
+        return tuple(names)
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format used by flamegraph.pl and inferno"""
+        lines = [f"{';'.join(name.replace(';', ':') for name in stack)} {count}"
+                 for stack, count in self.stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str = "profile") -> dict:
+        """Profile as a speedscope sampled-profile document"""
+        frame_index: Dict[str, int] = {}
+        frames = []
+        samples = []
+        weights = []
+        # Actual time per sampling round, including the cost of taking the samples
+        interval_ms = (self.duration / self.rounds if self.rounds else self.interval) * 1000.0
+        for stack, count in self.stacks.most_common():
+            sample = []
+            for frame_name in stack:
+                index = frame_index.get(frame_name)
+                if index is None:
+                    index = frame_index[frame_name] = len(frames)
+                    frames.append({"name": frame_name})
+                sample.append(index)
+            samples.append(sample)
+            weights.append(count * interval_ms)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "vuelos-paraiso-backend",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Security, Depends, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Security, Depends, Header, Query, Request
+from fastapi.responses import PlainTextResponse, JSONResponse, StreamingResponse
 from fastapi.security.api_key import APIKeyHeader
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -6,9 +7,16 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Union, Deque
+from collections import deque
+import bisect
+import math
+import asyncio
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from external_integrations import ForwardingPipeline, load_destinations_from_env
+from profiler import SamplingProfiler
+from tracks import TRACK_PARSERS, gpx_chunks, igc_chunks, geojson_chunks
 
 # Root directory and environment variables
 ROOT_DIR = Path(__file__).parent
@@ -37,10 +45,67 @@ async def get_api_key(api_key_header: str = Security(api_key_header)):
         )
     return api_key_header
 
+# Admin API Key Security (profiling and other operational endpoints)
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY")
+if not ADMIN_API_KEY:
+    logging.warning("ADMIN_API_KEY not found in environment variables. Admin endpoints are disabled.")
+
+admin_api_key_header = APIKeyHeader(name="X-Admin-Key", auto_error=False)
+
+async def get_admin_api_key(admin_api_key_header: str = Security(admin_api_key_header)):
+    if not ADMIN_API_KEY or not admin_api_key_header or admin_api_key_header != ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=403,
+            detail="Invalid or missing Admin API Key"
+        )
+    return admin_api_key_header
+
 # In-memory storage for flights and positions (instead of MongoDB)
 flights_data: Dict[str, dict] = {}
 positions_data: Dict[str, dict] = {}
 
+# Recent fixes per flight id, used for dead-reckoning between sparse updates
+position_history: Dict[str, Deque[dict]] = {}
+
+# Full track per flight id, sorted by timestamp, for GPX/IGC/GeoJSON export.
+# Ordered from least to most recently updated flight, so the oldest tracks are
+# evicted first once the process holds too many flights or fixes.
+tracks_data: Dict[str, List[dict]] = {}
+track_fix_total = 0           # fixes currently held across all tracks
+MAX_TRACK_FIXES = 20000       # about 5.5 hours at one fix per second
+MAX_TRACKED_FLIGHTS = 200
+MAX_TOTAL_TRACK_FIXES = 500000
+TRACK_CHUNK_SIZE = 500        # fixes per chunk when streaming exports
+IMPORT_BATCH_SIZE = 500       # fixes recorded per batch when importing track files
+
+# Export formats: writer, media type and file extension
+TRACK_EXPORTS = {
+    "gpx": (gpx_chunks, "application/gpx+xml", "gpx"),
+    "igc": (igc_chunks, "text/plain", "igc"),
+    "geojson": (geojson_chunks, "application/geo+json", "geojson"),
+}
+
+# Only one profile may run at a time
+profile_lock = asyncio.Lock()
+# Stay below nginx's default 60 s proxy_read_timeout
+MAX_PROFILE_SECONDS = 50
+
+# Background forwarding of accepted updates to the booking system and partner tracking service
+FORWARDING_QUEUE_DIR = Path(os.environ.get("FORWARDING_QUEUE_DIR") or ROOT_DIR / "forwarding_queue")
+forwarder = ForwardingPipeline(load_destinations_from_env(), FORWARDING_QUEUE_DIR)
+
+# Motion estimation settings
+HISTORY_SIZE = 6              # fixes kept per flight
+GPS_ERROR_M = 10.0            # base horizontal uncertainty of a single fix (meters)
+MAX_EXTRAPOLATION_S = 30.0    # beyond this, stop extrapolating and only grow the uncertainty
+STALE_AFTER_S = 4 * MAX_EXTRAPOLATION_S  # no estimate once the last fix is this old
+DEFAULT_ACCEL_MS2 = 1.5       # assumed acceleration when there is not enough history
+MIN_ACCEL_MS2 = 0.2           # floor for gusts and GPS noise, even in a perfectly steady glide
+DRIFT_TOLERANCE_M = 25.0      # acceptable dead-reckoning error before a new fix is needed
+MIN_UPDATE_INTERVAL_S = 1
+MAX_UPDATE_INTERVAL_S = 15
+MAX_CLOCK_SKEW_S = 30.0       # live fixes further ahead of server time are clamped to it
+
 # Define Models
 class GeoPosition(BaseModel):
     id: str
@@ -58,21 +123,167 @@ class FlightStatus(BaseModel):
     estimated_takeoff: Optional[datetime] = None  # Added estimated takeoff time
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+# Motion estimation helpers
+def _to_utc_naive(value: datetime) -> datetime:
+    """Normalize a timestamp to naive UTC so tracker and server times can be compared"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def _local_offset(origin: dict, fix: dict) -> tuple:
+    """East/north offset in meters of `fix` relative to `origin` (equirectangular approximation)"""
+    lat_rad = math.radians(origin["latitude"])
+    east = (fix["longitude"] - origin["longitude"]) * 111320.0 * math.cos(lat_rad)
+    north = (fix["latitude"] - origin["latitude"]) * 110540.0
+    return east, north
+
+def _velocities(fixes: List[dict]) -> List[tuple]:
+    """Velocity (east, north, vertical in m/s) and its time for each consecutive pair of fixes"""
+    result = []
+    for prev, curr in zip(fixes, fixes[1:]):
+        dt = (curr["timestamp"] - prev["timestamp"]).total_seconds()
+        if dt <= 0:
+            continue
+        east, north = _local_offset(prev, curr)
+        result.append((east / dt, north / dt, (curr["altitude"] - prev["altitude"]) / dt, curr["timestamp"]))
+    return result
+
+def estimate_motion(flight_id: str) -> Optional[dict]:
+    """Estimate velocity and acceleration of a flight from its latest fixes"""
+    fixes = list(position_history.get(flight_id, ()))
+    if not fixes:
+        return None
+    velocities = _velocities(fixes)
+    if not velocities:
+        return {"last_fix": fixes[-1], "velocity": (0.0, 0.0, 0.0), "acceleration": DEFAULT_ACCEL_MS2}
+
+    accelerations = []
+    for (ve0, vn0, _, t0), (ve1, vn1, _, t1) in zip(velocities, velocities[1:]):
+        dt = (t1 - t0).total_seconds()
+        if dt > 0:
+            accelerations.append(math.hypot(ve1 - ve0, vn1 - vn0) / dt)
+    acceleration = max(max(accelerations), MIN_ACCEL_MS2) if accelerations else DEFAULT_ACCEL_MS2
+
+    ve, vn, vu, _ = velocities[-1]
+    return {"last_fix": fixes[-1], "velocity": (ve, vn, vu), "acceleration": acceleration}
+
+def suggest_update_interval(motion: dict) -> int:
+    """Seconds a tracker can wait before the dead-reckoning error exceeds DRIFT_TOLERANCE_M"""
+    interval = math.sqrt(2.0 * DRIFT_TOLERANCE_M / motion["acceleration"])
+    return int(min(max(interval, MIN_UPDATE_INTERVAL_S), MAX_UPDATE_INTERVAL_S))
+
+def estimate_position(flight_id: str, now: Optional[datetime] = None) -> Optional[dict]:
+    """Extrapolate the current position of a flight with an uncertainty radius in meters"""
+    motion = estimate_motion(flight_id)
+    if motion is None:
+        return None
+    now = now or datetime.utcnow()
+    last_fix = motion["last_fix"]
+    age = max((now - last_fix["timestamp"]).total_seconds(), 0.0)
+    if age > STALE_AFTER_S:
+        return None
+    horizon = min(age, MAX_EXTRAPOLATION_S)
+
+    ve, vn, vu = motion["velocity"]
+    lat_rad = math.radians(last_fix["latitude"])
+    latitude = last_fix["latitude"] + vn * horizon / 110540.0
+    longitude = last_fix["longitude"] + ve * horizon / (111320.0 * max(math.cos(lat_rad), 1e-6))
+    altitude = last_fix["altitude"] + vu * horizon
+    uncertainty = GPS_ERROR_M + 0.5 * motion["acceleration"] * age ** 2
+
+    return {
+        "id": flight_id,
+        "latitude": latitude,
+        "longitude": longitude,
+        "altitude": altitude,
+        "timestamp": now,
+        "last_fix_timestamp": last_fix["timestamp"],
+        "uncertainty_m": round(uncertainty, 1),
+        "speed_ms": round(math.hypot(ve, vn), 2),
+        "vertical_speed_ms": round(vu, 2),
+    }
+
 # API Routes
 @api_router.get("/")
 async def root():
     return {"message": "Flight Control Dashboard API"}
 
+def _store_in_track(flight_id: str, fix: dict):
+    """Insert a fix into its flight track and evict the least recently updated tracks over the limits"""
+    global track_fix_total
+    # Re-inserting moves the flight to the most recently updated end
+    track = tracks_data.pop(flight_id, None) or []
+    tracks_data[flight_id] = track
+    if not track or fix["timestamp"] >= track[-1]["timestamp"]:
+        track.append(fix)
+    else:
+        bisect.insort(track, fix, key=lambda f: f["timestamp"])
+    track_fix_total += 1
+    if len(track) > MAX_TRACK_FIXES:
+        excess = len(track) - MAX_TRACK_FIXES
+        del track[:excess]
+        track_fix_total -= excess
+
+    while len(tracks_data) > 1 and (len(tracks_data) > MAX_TRACKED_FLIGHTS
+                                    or track_fix_total > MAX_TOTAL_TRACK_FIXES):
+        oldest = next(iter(tracks_data))
+        track_fix_total -= len(tracks_data.pop(oldest))
+
+def record_position(position: GeoPosition, live: bool = True) -> dict:
+    """Store an accepted fix in its flight track.
+
+    Live fixes also update the latest position and motion history and are
+    forwarded to external systems; imported historical fixes only go into the track.
+    """
+    fix = position.dict()
+    fix["timestamp"] = _to_utc_naive(fix["timestamp"])
+    if live:
+        # A tracker with a bad clock must not freeze the flight behind a future fix
+        now = datetime.utcnow()
+        if fix["timestamp"] > now + timedelta(seconds=MAX_CLOCK_SKEW_S):
+            fix["timestamp"] = now
+
+    _store_in_track(position.id, fix)
+
+    if not live:
+        return fix
+
+    latest = positions_data.get(position.id)
+    if latest is None or fix["timestamp"] >= latest["timestamp"]:
+        positions_data[position.id] = fix
+
+    history = position_history.setdefault(position.id, deque(maxlen=HISTORY_SIZE))
+    if history and fix["timestamp"] == history[-1]["timestamp"]:
+        history[-1] = fix
+    elif not history or fix["timestamp"] > history[-1]["timestamp"]:
+        history.append(fix)
+    # Out-of-order fixes go into the track but never replace a newer position or enter the motion model
+
+    forwarder.publish("position", fix)
+    return fix
+
+def record_positions(positions: List[GeoPosition], live: bool = True):
+    """Record a batch of fixes through record_position"""
+    for position in positions:
+        record_position(position, live=live)
+
 @api_router.post("/webhook/position")
 async def update_position(position: GeoPosition, api_key: str = Depends(get_api_key)):
     """Webhook endpoint to receive position updates from external systems"""
-    positions_data[position.id] = position.dict()
-    return {"status": "success", "message": f"Position updated for ID: {position.id}"}
+    record_position(position)
+
+    next_update_in = suggest_update_interval(estimate_motion(position.id))
+    return {
+        "status": "success",
+        "message": f"Position updated for ID: {position.id}",
+        "next_update_in": next_update_in,
+    }
 
 @api_router.post("/webhook/flight")
 async def update_flight(flight: FlightStatus, api_key: str = Depends(get_api_key)):
     """Webhook endpoint to receive flight status updates from external systems"""
     flights_data[flight.id] = flight.dict()
+    forwarder.publish("flight", flights_data[flight.id])
     return {"status": "success", "message": f"Flight status updated for ID: {flight.id}"}
 
 @api_router.get("/positions")
@@ -80,11 +291,135 @@ async def get_positions():
     """Get all current positions"""
     return list(positions_data.values())
 
+@api_router.get("/positions/estimated")
+async def get_estimated_positions():
+    """Get dead-reckoned current positions for flights still in the air, with uncertainty in meters"""
+    now = datetime.utcnow()
+    estimates = (
+        estimate_position(flight_id, now)
+        for flight_id in list(position_history)
+        if flights_data.get(flight_id, {}).get("status") != "landed"
+    )
+    return [estimate for estimate in estimates if estimate is not None]
+
 @api_router.get("/flights")
 async def get_flights():
     """Get all current flights"""
     return list(flights_data.values())
 
+@api_router.get("/tracks/{flight_id}")
+async def export_track(flight_id: str, format: str = Query("gpx", pattern="^(gpx|igc|geojson)$")):
+    """Stream the track of a flight as GPX, IGC or GeoJSON"""
+    if not tracks_data.get(flight_id):
+        raise HTTPException(status_code=404, detail=f"No track found for ID: {flight_id}")
+    writer, media_type, extension = TRACK_EXPORTS[format]
+    # Snapshot, so live fixes arriving while the file streams can't shift or tear it
+    track = list(tracks_data[flight_id])
+
+    def chunks():
+        for start in range(0, len(track), TRACK_CHUNK_SIZE):
+            yield track[start:start + TRACK_CHUNK_SIZE]
+
+    return StreamingResponse(
+        writer(flight_id, flights_data.get(flight_id), chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{flight_id}.{extension}"'},
+    )
+
+@api_router.post("/import/track")
+async def import_track(
+    request: Request,
+    format: str = Query(..., pattern="^(gpx|igc|geojsonseq)$"),
+    id: Optional[str] = None,
+    api_key: str = Depends(get_api_key),
+):
+    """Import a GPX, IGC or GeoJSONSeq track file from the request body, parsed as it streams in"""
+    if not id and format != "geojsonseq":
+        # Only GeoJSONSeq features carry their own flight id
+        raise HTTPException(status_code=400, detail=f"Query parameter 'id' is required for {format} imports")
+    parser = TRACK_PARSERS[format]()
+    imported = 0
+    skipped = 0
+    batch: List[GeoPosition] = []
+
+    def collect(fixes: List[dict]):
+        nonlocal skipped
+        for fix in fixes:
+            flight_id = id or fix.pop("id", None)
+            fix.pop("id", None)
+            if not flight_id or fix["timestamp"] is None:
+                skipped += 1
+                continue
+            batch.append(GeoPosition(id=flight_id, **fix))
+
+    async def flush(size: int):
+        nonlocal imported
+        positions = batch[:size]
+        del batch[:size]
+        # Historical fixes: track only, no live marker and no forwarding
+        record_positions(positions, live=False)
+        imported += len(positions)
+        # Let webhooks run between batches
+        await asyncio.sleep(0)
+
+    try:
+        async for data in request.stream():
+            collect(parser.feed(data))
+            while len(batch) >= IMPORT_BATCH_SIZE:
+                await flush(IMPORT_BATCH_SIZE)
+        collect(parser.close())
+    except ValueError as e:
+        while batch:
+            await flush(IMPORT_BATCH_SIZE)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid {format} file after importing {imported} positions: {e}"
+        )
+    while batch:
+        await flush(IMPORT_BATCH_SIZE)
+
+    return {
+        "status": "success",
+        "message": f"Imported {imported} positions",
+        "imported": imported,
+        "skipped": skipped,
+    }
+
+@api_router.get("/admin/profile")
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    by_route: bool = False,
+    include_idle: bool = False,
+    interval_ms: float = Query(5.0, ge=1, le=100),
+    admin_key: str = Depends(get_admin_api_key),
+):
+    """Sample the running backend for N seconds and return a flamegraph-compatible profile"""
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with profile_lock:
+        sampler = SamplingProfiler(interval=interval_ms / 1000.0, by_route=by_route, include_idle=include_idle)
+        await asyncio.to_thread(sampler.run, seconds)
+
+    name = f"backend-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}"
+    if format == "speedscope":
+        return JSONResponse(
+            sampler.speedscope(name),
+            headers={"Content-Disposition": f'attachment; filename="{name}.speedscope.json"'},
+        )
+    return PlainTextResponse(
+        sampler.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="{name}.collapsed.txt"'},
+    )
+
+@app.on_event("startup")
+async def start_forwarding():
+    await forwarder.start()
+
+@app.on_event("shutdown")
+async def stop_forwarding():
+    await forwarder.stop()
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -0,0 +1,301 @@
+import json
+import re
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterable, Iterator, List, Optional
+from xml.etree.ElementTree import ParseError, XMLPullParser
+from xml.sax.saxutils import escape
+
+ChunksFactory = Callable[[], Iterable[List[dict]]]
+
+# Writers: each takes the flight id, its status record (may be None) and a
+# callable returning a fresh iterator over chunks of fixes, and yields the
+# file as text chunks.
+
+def _iso(timestamp: datetime) -> str:
+    return timestamp.isoformat() + "Z"
+
+
+def gpx_chunks(flight_id: str, flight: Optional[dict], chunks: ChunksFactory) -> Iterator[str]:
+    """GPX 1.1 track, one <trkpt> per fix"""
+    description = ""
+    if flight:
+        description = f"<desc>{escape(flight['pilot_name'])} / {escape(flight['passenger_name'])}</desc>"
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="Vuelos Paraiso" xmlns="http://www.topografix.com/GPX/1/1">\n'
+        f"<trk><name>{escape(flight_id)}</name>{description}<trkseg>\n"
+    )
+    for chunk in chunks():
+        yield "".join(
+            f'<trkpt lat="{fix["latitude"]:.7f}" lon="{fix["longitude"]:.7f}">'
+            f'<ele>{fix["altitude"]:.1f}</ele><time>{_iso(fix["timestamp"])}</time></trkpt>\n'
+            for fix in chunk
+        )
+    yield "</trkseg></trk>\n</gpx>\n"
+
+
+def _igc_text(value: str) -> str:
+    """IGC files are ASCII only"""
+    return unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+
+
+def _igc_coordinate(value: float, degree_digits: int, positive: str, negative: str) -> str:
+    hemisphere = positive if value >= 0 else negative
+    value = abs(value)
+    degrees = int(value)
+    thousandths = round((value - degrees) * 60000)
+    if thousandths >= 60000:
+        degrees, thousandths = degrees + 1, thousandths - 60000
+    return f"{degrees:0{degree_digits}d}{thousandths:05d}{hemisphere}"
+
+
+def _igc_altitude(value: float) -> str:
+    value = round(value)
+    return f"{value:05d}" if value >= 0 else f"-{abs(value):04d}"
+
+
+def igc_chunks(flight_id: str, flight: Optional[dict], chunks: ChunksFactory) -> Iterator[str]:
+    """IGC flight recorder file with GNSS altitude only (no pressure altitude)"""
+    header_sent = False
+    for chunk in chunks():
+        if not chunk:
+            continue
+        lines = []
+        if not header_sent:
+            lines.append("AXXXVPS Vuelos Paraiso")
+            lines.append(f"HFDTEDATE:{chunk[0]['timestamp']:%d%m%y},01")
+            if flight:
+                lines.append(f"HFPLTPILOTINCHARGE:{_igc_text(flight['pilot_name'])}")
+                lines.append(f"HFCM2CREW2:{_igc_text(flight['passenger_name'])}")
+            lines.append("HFGTYGLIDERTYPE:Tandem paraglider")
+            lines.append(f"HFCIDCOMPETITIONID:{_igc_text(flight_id)}")
+            lines.append("HFALGALTGPS:GEO")
+            header_sent = True
+        for fix in chunk:
+            lines.append(
+                f"B{fix['timestamp']:%H%M%S}"
+                f"{_igc_coordinate(fix['latitude'], 2, 'N', 'S')}"
+                f"{_igc_coordinate(fix['longitude'], 3, 'E', 'W')}"
+                f"A00000{_igc_altitude(fix['altitude'])}"
+            )
+        yield "\r\n".join(lines) + "\r\n"
+
+
+def geojson_chunks(flight_id: str, flight: Optional[dict], chunks: ChunksFactory) -> Iterator[str]:
+    """GeoJSON LineString feature with per-point times in `coordTimes`.
+
+    Coordinates and times are written in two passes over the track, so
+    `chunks` must yield the same fixes both times (pass a snapshot, not the
+    live track). The feature is written on a single line, so it can be
+    imported back as GeoJSONSeq.
+    """
+    properties = {"id": flight_id}
+    if flight:
+        properties.update(pilot_name=flight["pilot_name"], passenger_name=flight["passenger_name"])
+    yield '{"type": "Feature", "geometry": {"type": "LineString", "coordinates": ['
+    separator = ""
+    for chunk in chunks():
+        if chunk:
+            yield separator + ",".join(
+                f"[{fix['longitude']:.7f},{fix['latitude']:.7f},{fix['altitude']:.1f}]" for fix in chunk
+            )
+            separator = ","
+    yield ']}, "properties": ' + json.dumps(properties)[:-1] + ', "coordTimes": ['
+    separator = ""
+    for chunk in chunks():
+        if chunk:
+            yield separator + ",".join(f'"{_iso(fix["timestamp"])}"' for fix in chunk)
+            separator = ","
+    yield "]}}\n"
+
+
+# Parsers: feed() takes raw bytes as they arrive and returns the fixes
+# completed so far; close() returns whatever is left. Fixes are dicts with
+# latitude, longitude, altitude, a naive UTC timestamp and optionally an id.
+
+def _parse_time(value: str) -> datetime:
+    timestamp = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+class GPXParser:
+    """Incremental GPX parser that only keeps the track point being parsed"""
+
+    def __init__(self):
+        self._parser = XMLPullParser(events=("start", "end"))
+        self._stack = []
+
+    def feed(self, data: bytes) -> List[dict]:
+        try:
+            self._parser.feed(data)
+        except ParseError as e:
+            raise ValueError(str(e))
+        return self._collect()
+
+    def close(self) -> List[dict]:
+        try:
+            self._parser.close()
+        except ParseError as e:
+            raise ValueError(str(e))
+        return self._collect()
+
+    def _collect(self) -> List[dict]:
+        fixes = []
+        for event, element in self._parser.read_events():
+            if event == "start":
+                self._stack.append(element)
+                continue
+            self._stack.pop()
+            if element.tag.rsplit("}", 1)[-1] != "trkpt":
+                continue
+            try:
+                fix = {"latitude": float(element.get("lat")), "longitude": float(element.get("lon")),
+                       "altitude": 0.0, "timestamp": None}
+                for child in element:
+                    tag = child.tag.rsplit("}", 1)[-1]
+                    if tag == "ele" and child.text:
+                        fix["altitude"] = float(child.text)
+                    elif tag == "time" and child.text:
+                        fix["timestamp"] = _parse_time(child.text)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"invalid trkpt: {e}")
+            if self._stack:
+                self._stack[-1].remove(element)
+            fixes.append(fix)
+        return fixes
+
+
+_IGC_B_RECORD = re.compile(
+    r"^B(\d{2})(\d{2})(\d{2})(\d{2})(\d{5})([NS])(\d{3})(\d{5})([EW])[AV]([-\d]\d{4})([-\d]\d{4})"
+)
+_IGC_DATE = re.compile(r"^HFDTE(?:DATE:)?(\d{2})(\d{2})(\d{2})")
+
+
+class _LineParser:
+    """Splits incoming bytes into complete lines.
+
+    A line is buffered whole until its newline arrives, so lines longer than
+    `max_line_bytes` are rejected instead of growing the buffer without limit.
+    """
+
+    encoding = "utf-8"
+    max_line_bytes = 4 * 1024 * 1024   # fits a single-line GeoJSON export of a full track
+
+    def __init__(self):
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+
+    def feed(self, data: bytes) -> List[dict]:
+        *lines, rest = data.split(b"\n")
+        if lines:
+            lines[0] = b"".join(self._pending) + lines[0]
+            self._pending, self._pending_size = [], 0
+        for line in lines:
+            self._check_length(len(line))
+        self._pending.append(rest)
+        self._pending_size += len(rest)
+        self._check_length(self._pending_size)
+        return self._parse_lines(lines)
+
+    def close(self) -> List[dict]:
+        lines, self._pending, self._pending_size = [b"".join(self._pending)], [], 0
+        return self._parse_lines(lines)
+
+    def _check_length(self, size: int):
+        if size > self.max_line_bytes:
+            raise ValueError(f"line longer than {self.max_line_bytes} bytes")
+
+    def _parse_lines(self, lines: List[bytes]) -> List[dict]:
+        fixes = []
+        for line in lines:
+            line = line.decode(self.encoding, "replace").strip()
+            if line:
+                fixes.extend(self.parse_line(line))
+        return fixes
+
+    def parse_line(self, line: str) -> List[dict]:
+        raise NotImplementedError
+
+
+class IGCParser(_LineParser):
+    """Incremental IGC parser for B (fix) records"""
+
+    encoding = "latin-1"
+
+    def __init__(self):
+        super().__init__()
+        self._date: Optional[datetime] = None
+        self._last: Optional[datetime] = None
+
+    def parse_line(self, line: str) -> List[dict]:
+        date = _IGC_DATE.match(line)
+        if date:
+            day, month, year = (int(part) for part in date.groups())
+            self._date = datetime(2000 + year, month, day)
+            return []
+        record = _IGC_B_RECORD.match(line)
+        if not record:
+            return []
+        if self._date is None:
+            raise ValueError("IGC file has no HFDTE date record before its first fix")
+        (hh, mm, ss, lat_deg, lat_min, lat_hem, lon_deg, lon_min, lon_hem,
+         pressure_alt, gnss_alt) = record.groups()
+        timestamp = self._date + timedelta(hours=int(hh), minutes=int(mm), seconds=int(ss))
+        if self._last is not None and timestamp < self._last:
+            # Flight crossed midnight UTC
+            self._date += timedelta(days=1)
+            timestamp += timedelta(days=1)
+        self._last = timestamp
+        latitude = int(lat_deg) + int(lat_min) / 60000.0
+        longitude = int(lon_deg) + int(lon_min) / 60000.0
+        altitude = int(gnss_alt) or int(pressure_alt)
+        return [{
+            "latitude": -latitude if lat_hem == "S" else latitude,
+            "longitude": -longitude if lon_hem == "W" else longitude,
+            "altitude": float(altitude),
+            "timestamp": timestamp,
+        }]
+
+
+class GeoJSONSeqParser(_LineParser):
+    """Incremental parser for newline-delimited GeoJSON features (RFC 8142).
+
+    Accepts Point features with a `time` property and LineString features
+    with a `coordTimes` property, as written by the GeoJSON export.
+    """
+
+    def parse_line(self, line: str) -> List[dict]:
+        try:
+            feature = json.loads(line.lstrip("\x1e"))
+            geometry = feature["geometry"]
+            properties = feature.get("properties") or {}
+            if geometry["type"] == "Point":
+                points = [(geometry["coordinates"], properties.get("time"))]
+            elif geometry["type"] == "LineString":
+                points = zip(geometry["coordinates"], properties.get("coordTimes") or [])
+            else:
+                return []
+            fixes = []
+            for coordinates, time in points:
+                fix = {
+                    "longitude": float(coordinates[0]),
+                    "latitude": float(coordinates[1]),
+                    "altitude": float(coordinates[2]) if len(coordinates) > 2 else 0.0,
+                    "timestamp": _parse_time(time) if time else None,
+                }
+                if properties.get("id"):
+                    fix["id"] = str(properties["id"])
+                fixes.append(fix)
+            return fixes
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise ValueError(f"invalid GeoJSON feature: {e}")
+
+
+TRACK_PARSERS = {
+    "gpx": GPXParser,
+    "igc": IGCParser,
+    "geojsonseq": GeoJSONSeqParser,
+}
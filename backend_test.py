@@ -154,6 +154,15 @@ class FlightControlAPITester:
             200
         )
 
+    def test_get_estimated_positions(self):
+        """Get dead-reckoned positions"""
+        return self.run_test(
+            "Get Estimated Positions",
+            "GET",
+            "positions/estimated",
+            200
+        )
+
     def verify_flight_in_list(self, flight_id, flights_list):
         """Verify a flight exists in the flights list"""
         self.tests_run += 1
@@ -272,6 +281,21 @@ class FlightControlAPITester:
         
         return found
         
+    def verify_position_not_in_list(self, flight_id, positions_list):
+        """Verify a position is absent from the positions list"""
+        self.tests_run += 1
+        print(f"\n🔍 Verifying position for flight {flight_id} is not in positions list...")
+        
+        found = any(position['id'] == flight_id for position in positions_list)
+        
+        if not found:
+            self.tests_passed += 1
+            print(f"✅ Passed - Position for flight {flight_id} not in list")
+        else:
+            print(f"❌ Failed - Position for flight {flight_id} unexpectedly found in list")
+        
+        return not found
+        
     def verify_estimated_takeoff_in_flight(self, flight_id, flights_list):
         """Verify a flight has the estimated takeoff time field"""
         self.tests_run += 1
@@ -317,11 +341,13 @@ def main():
     # Create test flights with different statuses
     flight_statuses = ["scheduled", "flying", "paused", "landed"]
     flight_ids = []
+    flight_status_by_id = {}
     
     for status in flight_statuses:
         success, flight_id = tester.test_create_flight()
         if success:
             flight_ids.append(flight_id)
+            flight_status_by_id[flight_id] = status
             
             # Update the flight status
             tester.test_update_flight_status(flight_id, status)
@@ -360,6 +386,16 @@ def main():
         for flight_id in flight_ids:
             tester.verify_position_in_list(flight_id, positions)
     
+    # Get estimated positions and verify they carry an uncertainty (landed flights are left out)
+    success, estimated_response = tester.test_get_estimated_positions()
+    if success:
+        for flight_id in flight_ids:
+            if flight_status_by_id[flight_id] == "landed":
+                tester.verify_position_not_in_list(flight_id, estimated_response)
+            elif tester.verify_position_in_list(flight_id, estimated_response):
+                estimate = next(p for p in estimated_response if p['id'] == flight_id)
+                print(f"   Uncertainty for {flight_id}: {estimate['uncertainty_m']} m")
+    
     # Print results
     print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
     return 0 if tester.tests_passed == tester.tests_run else 1
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("httpx")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from external_integrations import Destination, ForwardingPipeline, RetryQueue  # noqa: E402
+
+
+class StandInServer:
+    """Local HTTP server standing in for the booking/partner systems"""
+
+    def __init__(self, fail_first=0):
+        self.batches = []
+        self.fail_first = fail_first
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                if server.fail_first > 0:
+                    server.fail_first -= 1
+                    status = 503
+                else:
+                    server.batches.append(json.loads(body)["events"])
+                    status = 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/updates"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def events(self):
+        return [event for batch in self.batches for event in batch]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandInServer()
+    yield server
+    server.close()
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.05)
+
+
+def test_updates_are_batched_per_destination(stand_in, tmp_path):
+    destinations = [
+        Destination(name="booking", url=stand_in.url, events=("flight",), flush_interval=0.2),
+        Destination(name="partner_tracking", url=stand_in.url, flush_interval=0.2),
+    ]
+
+    async def scenario():
+        pipeline = ForwardingPipeline(destinations, tmp_path)
+        await pipeline.start()
+        for i in range(5):
+            pipeline.publish("position", {"id": "vuelo-1", "latitude": 4.6, "longitude": -74.0, "altitude": i})
+        pipeline.publish("flight", {"id": "vuelo-1", "status": "flying"})
+        await _wait_for(lambda: len(stand_in.events()) == 7)
+        await pipeline.stop()
+
+    asyncio.run(scenario())
+
+    # partner_tracking gets all six updates in one batch, booking only the flight update
+    assert sorted(len(batch) for batch in stand_in.batches) == [1, 6]
+    assert [e["type"] for e in stand_in.events()].count("flight") == 2
+
+
+def test_failed_batches_are_retried_from_disk(tmp_path):
+    server = StandInServer(fail_first=2)
+    destination = Destination(name="partner_tracking", url=server.url, flush_interval=0.05)
+
+    async def scenario():
+        pipeline = ForwardingPipeline([destination], tmp_path, retry_poll_interval=0.05)
+        pipeline.retry_queues["partner_tracking"].base_delay = 0.05
+        await pipeline.start()
+        pipeline.publish("position", {"id": "vuelo-2", "latitude": 4.6, "longitude": -74.0, "altitude": 1500})
+        await _wait_for(lambda: len(server.events()) == 1)
+        await pipeline.stop()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.close()
+
+    assert server.events()[0]["data"]["id"] == "vuelo-2"
+    assert len(RetryQueue(tmp_path / "partner_tracking")) == 0
+
+
+# Nothing listens on this port, every send fails
+DEAD_URL = "http://127.0.0.1:9/updates"
+
+
+def _events_on_disk(directory):
+    queue = RetryQueue(directory)
+    return [event for path in sorted(directory.glob("*.json")) for event in queue.read(path)[1]]
+
+
+def _position(i):
+    return {"id": f"vuelo-{i}", "latitude": 4.6, "longitude": -74.0, "altitude": 0}
+
+
+def test_publish_does_not_block_when_destination_is_down(tmp_path):
+    destination = Destination(name="booking", url=DEAD_URL, flush_interval=0.05, queue_size=1000)
+
+    async def scenario():
+        pipeline = ForwardingPipeline([destination], tmp_path, timeout=0.5, retry_poll_interval=60)
+        await pipeline.start()
+        start = time.monotonic()
+        for i in range(12000):
+            pipeline.publish("position", _position(i))
+        elapsed = time.monotonic() - start
+        await pipeline.stop()
+        return elapsed, pipeline.dropped["booking"]
+
+    elapsed, dropped = asyncio.run(scenario())
+
+    assert elapsed < 0.5
+    # Overflow is written in batches by the worker, not one file per event
+    assert len(list((tmp_path / "booking").glob("*.json"))) <= 2000 // destination.batch_size + 2
+    assert len(_events_on_disk(tmp_path / "booking")) + dropped == 12000
+
+
+def test_stop_with_backlog_returns_and_saves_everything(tmp_path):
+    destination = Destination(name="partner_tracking", url=DEAD_URL, flush_interval=0.05)
+
+    async def scenario():
+        pipeline = ForwardingPipeline([destination], tmp_path, timeout=0.5, retry_poll_interval=0.05)
+        await pipeline.start()
+        for i in range(1200):
+            pipeline.publish("position", _position(i))
+        await asyncio.sleep(0.1)
+        start = time.monotonic()
+        await asyncio.wait_for(pipeline.stop(), 5)
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) < 2
+    ids = {event["data"]["id"] for event in _events_on_disk(tmp_path / "partner_tracking")}
+    assert ids == {f"vuelo-{i}" for i in range(1200)}
+
+
+def test_stop_saves_partially_filled_batch(tmp_path):
+    destination = Destination(name="booking", url=DEAD_URL, flush_interval=5.0)
+
+    async def scenario():
+        pipeline = ForwardingPipeline([destination], tmp_path, retry_poll_interval=60)
+        await pipeline.start()
+        for i in range(3):
+            pipeline.publish("position", _position(i))
+        # Let the worker start filling its batch
+        await asyncio.sleep(0.2)
+        await asyncio.wait_for(pipeline.stop(), 2)
+
+    asyncio.run(scenario())
+
+    assert len(_events_on_disk(tmp_path / "booking")) == 3
+
+
+def test_publish_without_subscribers_skips_serialization(tmp_path, monkeypatch):
+    from external_integrations import forwarding
+
+    def fail(*args, **kwargs):
+        raise AssertionError("event was serialized")
+
+    monkeypatch.setattr(forwarding.json, "dumps", fail)
+    destination = Destination(name="booking", url=DEAD_URL, events=("flight",))
+
+    async def scenario():
+        # Not started: no queues at all
+        ForwardingPipeline([], tmp_path).publish("position", _position(0))
+        pipeline = ForwardingPipeline([destination], tmp_path, retry_poll_interval=60)
+        pipeline.publish("position", _position(0))
+        await pipeline.start()
+        # Started, but nobody subscribes to positions
+        pipeline.publish("position", _position(0))
+        await pipeline.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,115 @@
+import math
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+HEADERS = {"X-API-Key": server.API_KEY}
+START = datetime(2025, 3, 15, 10, 30)
+
+
+@pytest.fixture
+def client():
+    for data in (server.flights_data, server.positions_data, server.position_history, server.tracks_data):
+        data.clear()
+    server.track_fix_total = 0
+    with TestClient(server.app) as client:
+        yield client
+
+
+def _post_fix(client, flight_id, latitude, longitude, timestamp, altitude=2000.0):
+    response = client.post("/api/webhook/position", headers=HEADERS, json={
+        "id": flight_id,
+        "latitude": latitude,
+        "longitude": longitude,
+        "altitude": altitude,
+        "timestamp": timestamp.isoformat() + "Z",
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def _glide(client, flight_id, start=START, count=5, step=0.0001):
+    """Straight line north at constant speed (about 5.5 m/s with 2 s between fixes)"""
+    response = None
+    for i in range(count):
+        response = _post_fix(client, flight_id, 4.6 + i * step, -74.0, start + timedelta(seconds=2 * i))
+    return response
+
+
+def test_steady_glide_gets_longest_interval(client):
+    response = _glide(client, "glide")
+    assert response["next_update_in"] == server.MAX_UPDATE_INTERVAL_S
+
+
+def test_turning_gets_shorter_interval(client):
+    # Thermalling: circle of 30 m radius at 10 m/s, a fix every 2 s
+    radius, speed = 30.0, 10.0
+    response = None
+    for i in range(6):
+        angle = speed * 2 * i / radius
+        north = radius * math.sin(angle) / 110540.0
+        east = radius * math.cos(angle) / (111320.0 * math.cos(math.radians(4.6)))
+        response = _post_fix(client, "thermal", 4.6 + north, -74.0 + east, START + timedelta(seconds=2 * i))
+    assert response["next_update_in"] < server.MAX_UPDATE_INTERVAL_S
+
+
+def test_extrapolation_stops_at_max_horizon(client):
+    _glide(client, "glide")
+    last_fix = server.position_history["glide"][-1]["timestamp"]
+
+    at_limit = server.estimate_position("glide", last_fix + timedelta(seconds=server.MAX_EXTRAPOLATION_S))
+    beyond = server.estimate_position("glide", last_fix + timedelta(seconds=server.MAX_EXTRAPOLATION_S + 30))
+
+    assert at_limit["latitude"] > server.position_history["glide"][-1]["latitude"]
+    assert beyond["latitude"] == pytest.approx(at_limit["latitude"])
+    assert beyond["uncertainty_m"] > at_limit["uncertainty_m"]
+
+
+def test_stale_and_landed_flights_are_not_estimated(client):
+    now = datetime.utcnow()
+    _glide(client, "stale", start=now - timedelta(seconds=server.STALE_AFTER_S + 60))
+    _glide(client, "live", start=now - timedelta(seconds=10))
+    _glide(client, "landed", start=now - timedelta(seconds=10))
+    client.post("/api/webhook/flight", headers=HEADERS, json={
+        "id": "landed", "pilot_name": "Juan", "passenger_name": "Ana", "status": "landed",
+    })
+
+    estimates = client.get("/api/positions/estimated").json()
+
+    assert [estimate["id"] for estimate in estimates] == ["live"]
+
+
+def test_out_of_order_fixes_are_ignored(client):
+    _glide(client, "glide")
+    history = list(server.position_history["glide"])
+    latest = server.positions_data["glide"]
+
+    # A late fix from before the last one, far off the glide path
+    _post_fix(client, "glide", 5.0, -75.0, START + timedelta(seconds=1))
+
+    assert list(server.position_history["glide"]) == history
+    assert server.positions_data["glide"] == latest
+
+
+def test_future_fix_does_not_freeze_flight(client):
+    now = datetime.utcnow()
+    _post_fix(client, "skewed", 4.6, -74.0, datetime(2030, 1, 1))
+    assert server.positions_data["skewed"]["timestamp"] <= datetime.utcnow()
+
+    _post_fix(client, "skewed", 4.601, -74.0, now + timedelta(seconds=1))
+    _post_fix(client, "skewed", 4.602, -74.0, now + timedelta(seconds=3))
+
+    assert server.positions_data["skewed"]["latitude"] == 4.602
+    assert server.position_history["skewed"][-1]["latitude"] == 4.602
+    estimate = client.get("/api/positions/estimated").json()[0]
+    assert estimate["last_fix_timestamp"] == (now + timedelta(seconds=3)).isoformat()
@@ -0,0 +1,95 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+ADMIN_HEADERS = {"X-Admin-Key": "test-admin-key"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_API_KEY", "test-admin-key")
+    with TestClient(server.app) as client:
+        yield client
+
+
+def test_missing_or_wrong_admin_key_is_rejected(client):
+    assert client.get("/api/admin/profile?seconds=0.1").status_code == 403
+    assert client.get("/api/admin/profile?seconds=0.1", headers={"X-Admin-Key": "wrong"}).status_code == 403
+    # The regular API key does not grant admin access
+    assert client.get("/api/admin/profile?seconds=0.1", headers={"X-API-Key": server.API_KEY}).status_code == 403
+
+
+def test_admin_endpoints_disabled_without_admin_key(client, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_API_KEY", None)
+    assert client.get("/api/admin/profile?seconds=0.1", headers=ADMIN_HEADERS).status_code == 403
+
+
+def test_profile_formats(client):
+    response = client.get("/api/admin/profile?seconds=0.2&by_route=true", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].endswith('.collapsed.txt"')
+
+    response = client.get("/api/admin/profile?seconds=0.2&format=speedscope", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["profiles"][0]["type"] == "sampled"
+
+
+def test_profile_duration_is_capped(client):
+    response = client.get(f"/api/admin/profile?seconds={server.MAX_PROFILE_SECONDS + 1}", headers=ADMIN_HEADERS)
+    assert response.status_code == 422
+
+
+def test_concurrent_profile_is_rejected(client):
+    first = {}
+    thread = threading.Thread(target=lambda: first.update(
+        response=client.get("/api/admin/profile?seconds=1", headers=ADMIN_HEADERS)))
+    thread.start()
+    deadline = time.monotonic() + 2
+    while not server.profile_lock.locked() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    second = client.get("/api/admin/profile?seconds=0.1", headers=ADMIN_HEADERS)
+    thread.join()
+
+    assert second.status_code == 409
+    assert first["response"].status_code == 200
+
+
+def test_samples_are_tagged_with_route_template(client):
+    async def busy(n: int):
+        # Keeps the event loop busy inside the route so the sampler catches it
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            sum(range(1000))
+        return {"n": n}
+
+    server.app.add_api_route("/api/test/busy/{n}", busy)
+    try:
+        profile = {}
+        thread = threading.Thread(target=lambda: profile.update(response=client.get(
+            "/api/admin/profile?seconds=1&by_route=true", headers=ADMIN_HEADERS)))
+        thread.start()
+        deadline = time.monotonic() + 2
+        while not server.profile_lock.locked() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert client.get("/api/test/busy/7").status_code == 200
+        thread.join()
+    finally:
+        server.app.router.routes[:] = [
+            route for route in server.app.router.routes if getattr(route, "path", None) != "/api/test/busy/{n}"
+        ]
+
+    assert profile["response"].status_code == 200
+    assert any(line.startswith("[route] /api/test/busy/{n};") for line in profile["response"].text.splitlines())
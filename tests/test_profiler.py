@@ -0,0 +1,52 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("starlette")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from profiler import SamplingProfiler  # noqa: E402
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=_busy_loop, args=(stop,), daemon=True)
+    thread.start()
+    yield
+    stop.set()
+    thread.join()
+
+
+def test_collapsed_stacks_include_busy_function(busy_thread):
+    sampler = SamplingProfiler(interval=0.002)
+    sampler.run(0.2)
+
+    lines = sampler.collapsed().strip().splitlines()
+    busy = [line for line in lines if "_busy_loop" in line]
+    assert busy
+    stack, count = busy[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[-1].startswith("_busy_loop")
+
+
+def test_speedscope_document(busy_thread):
+    sampler = SamplingProfiler(interval=0.002, by_route=True)
+    sampler.run(0.1)
+
+    document = sampler.speedscope("test")
+    profile = document["profiles"][0]
+    frames = document["shared"]["frames"]
+    assert profile["type"] == "sampled"
+    assert len(profile["samples"]) == len(profile["weights"])
+    assert all(0 <= index < len(frames) for sample in profile["samples"] for index in sample)
+    # Samples outside of a request are tagged with no route
+    assert frames[profile["samples"][0][0]]["name"] == "[route] none"
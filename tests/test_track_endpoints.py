@@ -0,0 +1,165 @@
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from tracks import igc_chunks  # noqa: E402
+
+HEADERS = {"X-API-Key": server.API_KEY}
+
+
+@pytest.fixture
+def client():
+    for data in (server.flights_data, server.positions_data, server.position_history, server.tracks_data):
+        data.clear()
+    server.track_fix_total = 0
+    with TestClient(server.app) as client:
+        yield client
+
+
+def _igc_file(count):
+    start = datetime(2025, 3, 15, 10, 30)
+    track = [{"latitude": 4.6 + i * 1e-4, "longitude": -74.0, "altitude": 2800.0, "timestamp": start + timedelta(seconds=i)}
+             for i in range(count)]
+    return "".join(igc_chunks("hist-1", None, lambda: [track])).encode("ascii")
+
+
+def test_import_records_track_in_batches_without_going_live(client, monkeypatch):
+    batches = []
+    published = []
+    record_positions = server.record_positions
+
+    def spy(positions, live=True):
+        batches.append((len(positions), live))
+        record_positions(positions, live=live)
+
+    monkeypatch.setattr(server, "record_positions", spy)
+    monkeypatch.setattr(server.forwarder, "publish", lambda *args: published.append(args))
+
+    data = _igc_file(1200)
+    response = client.post("/api/import/track?format=igc&id=hist-1", headers=HEADERS,
+                           content=(data[i:i + 4096] for i in range(0, len(data), 4096)))
+
+    assert response.status_code == 200
+    assert response.json()["imported"] == 1200
+    assert all(size <= server.IMPORT_BATCH_SIZE and not live for size, live in batches)
+    assert sum(size for size, _ in batches) == 1200
+    assert len(server.tracks_data["hist-1"]) == 1200
+    # Historical fixes are not live positions and are not forwarded
+    assert published == []
+    assert client.get("/api/positions").json() == []
+    assert client.get("/api/positions/estimated").json() == []
+
+
+def test_import_requires_api_key(client):
+    response = client.post("/api/import/track?format=igc&id=hist-1", content=_igc_file(3))
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("format", ["gpx", "igc"])
+def test_import_without_id_is_rejected(client, format):
+    response = client.post(f"/api/import/track?format={format}", headers=HEADERS, content=_igc_file(3))
+
+    assert response.status_code == 400
+    assert "'id' is required" in response.json()["detail"]
+    assert server.tracks_data == {}
+
+
+def test_truncated_import_is_rejected(client):
+    data = (b'<gpx><trk><trkseg><trkpt lat="4.6" lon="-74.0"><time>2025-03-15T10:30:00Z</time></trkpt>'
+            b'<trkpt lat="4.7"')
+    response = client.post("/api/import/track?format=gpx&id=hist-2", headers=HEADERS, content=data)
+
+    assert response.status_code == 400
+    assert "after importing 1 positions" in response.json()["detail"]
+
+
+def test_import_with_overlong_line_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(server.TRACK_PARSERS["geojsonseq"], "max_line_bytes", 1000)
+    response = client.post("/api/import/track?format=geojsonseq", headers=HEADERS,
+                           content=(b"[" * 512 for _ in range(4)))
+
+    assert response.status_code == 400
+    assert "line longer than 1000 bytes" in response.json()["detail"]
+
+
+def test_export_unknown_flight_is_404(client):
+    assert client.get("/api/tracks/unknown?format=gpx").status_code == 404
+
+
+@pytest.mark.parametrize("format", ["gpx", "igc", "geojson"])
+def test_export_live_track(client, format):
+    start = datetime.utcnow() - timedelta(seconds=30)
+    for i in range(10):
+        client.post("/api/webhook/position", headers=HEADERS, json={
+            "id": "live-1", "latitude": 4.6 + i * 1e-4, "longitude": -74.0, "altitude": 2000,
+            "timestamp": (start + timedelta(seconds=i)).isoformat() + "Z",
+        })
+
+    response = client.get(f"/api/tracks/live-1?format={format}")
+
+    assert response.status_code == 200
+    assert f'filename="live-1.{format}"' in response.headers["content-disposition"]
+    if format == "geojson":
+        feature = json.loads(response.text)
+        assert len(feature["geometry"]["coordinates"]) == len(feature["properties"]["coordTimes"]) == 10
+
+
+def test_export_is_a_snapshot(client, monkeypatch):
+    for i in range(3):
+        server.record_position(server.GeoPosition(
+            id="live-2", latitude=4.6, longitude=-74.0, altitude=2000.0,
+            timestamp=datetime(2025, 3, 15, 10, 30, i)))
+
+    # A fix arriving between the two passes of the GeoJSON writer must not show up in either
+    geojson_chunks = server.TRACK_EXPORTS["geojson"][0]
+
+    def writer(flight_id, flight, chunks):
+        for i, text in enumerate(geojson_chunks(flight_id, flight, chunks)):
+            if i == 2:
+                server.record_position(server.GeoPosition(
+                    id="live-2", latitude=4.7, longitude=-74.0, altitude=2000.0,
+                    timestamp=datetime(2025, 3, 15, 10, 31)))
+            yield text
+
+    monkeypatch.setitem(server.TRACK_EXPORTS, "geojson", (writer, "application/geo+json", "geojson"))
+    feature = json.loads(client.get("/api/tracks/live-2?format=geojson").text)
+
+    assert len(feature["geometry"]["coordinates"]) == len(feature["properties"]["coordTimes"]) == 3
+
+
+def test_least_recently_updated_tracks_are_evicted(client, monkeypatch):
+    monkeypatch.setattr(server, "MAX_TRACKED_FLIGHTS", 3)
+    monkeypatch.setattr(server, "MAX_TOTAL_TRACK_FIXES", 10)
+    start = datetime(2025, 3, 15, 10, 30)
+
+    def record(flight_id, count):
+        server.record_positions([
+            server.GeoPosition(id=flight_id, latitude=4.6, longitude=-74.0, altitude=0.0,
+                               timestamp=start + timedelta(seconds=i))
+            for i in range(count)
+        ], live=False)
+
+    for flight_id in ("a", "b", "c"):
+        record(flight_id, 2)
+    record("a", 1)
+    record("d", 2)
+    # Over the flight limit: "b" is now the least recently updated
+    assert list(server.tracks_data) == ["c", "a", "d"]
+
+    record("e", 6)
+    # Over the fix limit: "c" and "a" go, the track being written is kept
+    assert list(server.tracks_data) == ["d", "e"]
+    assert server.track_fix_total == sum(map(len, server.tracks_data.values())) == 8
+
+    record("big", 12)
+    assert list(server.tracks_data) == ["big"]
@@ -0,0 +1,107 @@
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from tracks import GeoJSONSeqParser, GPXParser, IGCParser, geojson_chunks, gpx_chunks, igc_chunks  # noqa: E402
+
+FLIGHT = {"pilot_name": "Juan Pérez", "passenger_name": "María López"}
+
+
+def _track(count=25):
+    start = datetime(2025, 3, 15, 10, 30)
+    return [
+        {
+            "latitude": 4.6097 + i * 0.0001,
+            "longitude": -74.0817 - i * 0.0001,
+            "altitude": 2800.0 - i,
+            "timestamp": start + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+def _chunks(track, size=10):
+    return lambda: (track[i:i + size] for i in range(0, len(track), size))
+
+
+def _parse_in_pieces(parser, data: bytes, size=37):
+    fixes = []
+    for i in range(0, len(data), size):
+        fixes.extend(parser.feed(data[i:i + size]))
+    fixes.extend(parser.close())
+    return fixes
+
+
+@pytest.mark.parametrize("writer, parser, tolerance", [
+    (gpx_chunks, GPXParser, 1e-7),
+    (igc_chunks, IGCParser, 1e-5),
+    (geojson_chunks, GeoJSONSeqParser, 1e-7),
+])
+def test_round_trip(writer, parser, tolerance):
+    track = _track()
+    data = "".join(writer("vuelo-123", FLIGHT, _chunks(track))).encode("utf-8")
+
+    fixes = _parse_in_pieces(parser(), data)
+
+    assert len(fixes) == len(track)
+    for fix, original in zip(fixes, track):
+        assert fix["timestamp"] == original["timestamp"]
+        assert fix["latitude"] == pytest.approx(original["latitude"], abs=tolerance)
+        assert fix["longitude"] == pytest.approx(original["longitude"], abs=tolerance)
+        assert fix["altitude"] == pytest.approx(original["altitude"], abs=1)
+
+
+def test_igc_header_is_ascii():
+    data = "".join(igc_chunks("vuelo-123", FLIGHT, _chunks(_track(3))))
+    assert "HFPLTPILOTINCHARGE:Juan Perez" in data
+    assert data.isascii()
+
+
+def test_igc_crossing_midnight():
+    data = b"HFDTEDATE:150325,01\r\nB2359595206343N00006198WA0058700558\r\nB0000015206343N00006198WA0058700558\r\n"
+    fixes = _parse_in_pieces(IGCParser(), data)
+    assert [fix["timestamp"] for fix in fixes] == [datetime(2025, 3, 15, 23, 59, 59), datetime(2025, 3, 16, 0, 0, 1)]
+    assert fixes[0]["longitude"] < 0
+
+
+def test_igc_without_date_is_rejected():
+    with pytest.raises(ValueError):
+        IGCParser().feed(b"B1101355206343N00006198WA0058700558\r\n")
+
+
+def test_gpx_truncated_file_is_rejected():
+    parser = GPXParser()
+    parser.feed(b'<gpx><trk><trkseg><trkpt lat="1" lon="2"><time>2025-03-15T10:30:00Z</time></trkpt><trkpt')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_geojsonseq_points_keep_their_id():
+    data = (
+        b'\x1e{"type": "Feature", "geometry": {"type": "Point", "coordinates": [-74.08, 4.61, 2800]},'
+        b' "properties": {"id": "vuelo-9", "time": "2025-03-15T10:30:00Z"}}\n'
+    )
+    fixes = _parse_in_pieces(GeoJSONSeqParser(), data)
+    assert fixes == [{
+        "latitude": 4.61, "longitude": -74.08, "altitude": 2800.0,
+        "timestamp": datetime(2025, 3, 15, 10, 30), "id": "vuelo-9",
+    }]
+
+
+def test_overlong_line_is_rejected():
+    parser = GeoJSONSeqParser()
+    parser.max_line_bytes = 100
+    parser.feed(b"x" * 60)
+    with pytest.raises(ValueError, match="line longer than 100 bytes"):
+        parser.feed(b"x" * 60)
+
+
+def test_full_track_export_fits_line_limit():
+    data = "".join(geojson_chunks("vuelo-123", FLIGHT, _chunks(_track(20000), size=500))).encode("utf-8")
+
+    assert len(data) < GeoJSONSeqParser.max_line_bytes
+    assert len(_parse_in_pieces(GeoJSONSeqParser(), data, size=65536)) == 20000